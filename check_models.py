@@ -1,12 +1,83 @@
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import argparse
+import hashlib
+import json
+import re
+import tempfile
+import time
+from typing import List
 
-# Load environment variables
-load_dotenv()
+# openai and dotenv are imported where they are used, since importing
+# openai alone takes a few hundred milliseconds
+_ENV_LOADED = False
 
-def check_available_models():
+def load_env():
+    """Load environment variables from .env once per process"""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _ENV_LOADED = True
+
+# Model listings change rarely, so cache them on disk between runs
+MODELS_CACHE_PATH = os.path.expanduser(os.path.join('~', '.devduo', 'models.json'))
+MODELS_CACHE_TTL = 24 * 60 * 60
+
+# Model ids that are chat models (the ones we care about)
+CHAT_MODEL_RE = re.compile(r"gpt-3\.5|gpt-4|turbo")
+
+def _read_models_cache(api_key: str):
+    """Return cached model ids for this API key, or None if missing or expired"""
+    try:
+        if time.time() - os.path.getmtime(MODELS_CACHE_PATH) >= MODELS_CACHE_TTL:
+            return None
+        with open(MODELS_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    # Different keys can see different models
+    if cached.get('key_hash') != _key_hash(api_key):
+        return None
+    return cached.get('models')
+
+def _write_models_cache(api_key: str, model_ids: List[str]):
+    """Atomically write model ids to the cache file"""
+    cache_dir = os.path.dirname(MODELS_CACHE_PATH)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'key_hash': _key_hash(api_key), 'models': model_ids}, f)
+        os.replace(tmp_path, MODELS_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️  Could not cache model list: {str(e)}")
+
+def _key_hash(api_key: str) -> str:
+    """Fingerprint an API key without storing it"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def list_model_ids(api_key: str, refresh: bool = False) -> List[str]:
+    """List all model ids for an API key, using the on-disk cache unless refresh is set"""
+    if not refresh:
+        cached = _read_models_cache(api_key)
+        if cached is not None:
+            return cached
+    
+    from openai import OpenAI
+    
+    client = OpenAI(api_key=api_key)
+    model_ids = [model.id for model in client.models.list().data]
+    _write_models_cache(api_key, model_ids)
+    return model_ids
+
+def filter_chat_models(model_ids: List[str]) -> List[str]:
+    """Return the sorted chat model ids from a list of model ids"""
+    return sorted(filter(CHAT_MODEL_RE.search, model_ids))
+
+def check_available_models(refresh: bool = False):
     """Check which models are available with your API key"""
+    load_env()
     api_key = os.getenv('OPENAI_API_KEY')
     
     if not api_key:
@@ -14,22 +85,14 @@ def check_available_models():
         return
     
     try:
-        client = OpenAI(api_key=api_key)
-        
         # Get list of available models
         print("🔍 Checking available models...")
-        models = client.models.list()
-        
-        # Filter for chat models (the ones we care about)
-        chat_models = []
-        for model in models.data:
-            if any(keyword in model.id for keyword in ['gpt-3.5', 'gpt-4', 'turbo']):
-                chat_models.append(model.id)
+        chat_models = filter_chat_models(list_model_ids(api_key, refresh))
         
         print(f"\n✅ Found {len(chat_models)} chat models available:")
         print("-" * 50)
         
-        for model in sorted(chat_models):
+        for model in chat_models:
             print(f"  📝 {model}")
         
         # Recommend which one to use
@@ -52,4 +115,7 @@ def check_available_models():
         print("  - API key doesn't have proper permissions")
 
 if __name__ == "__main__":
-    check_available_models()
+    parser = argparse.ArgumentParser(description="Check which OpenAI models your API key can access")
+    parser.add_argument('--refresh-models', action='store_true', help="ignore the cached model list")
+    args = parser.parse_args()
+    check_available_models(refresh=args.refresh_models)
@@ -1,19 +1,163 @@
 import os
-from dotenv import load_dotenv
-import time
-from typing import Dict, List, Optional
-from openai import OpenAI
+import argparse
+import asyncio
+import re
+import sys
+import hashlib
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, List, Optional
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 import json
+from check_models import filter_chat_models, list_model_ids, load_env
+from llm_cache import LLMCache, SemanticCache, dumps
 
-# Load environment variables
-load_dotenv()
+# openai (and the httpx stack under it) is slow to import, so it is only
+# imported once a client is actually needed
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# Fenced python code blocks in agent responses. Fences only count at the start
+# of a line, so ``` inside the code (e.g. in a string) doesn't end the block.
+# A block cut off by the token limit has no closing fence, so it runs to the
+# end of the text instead
+CODE_RE = re.compile(r"^[ \t]*```python[^\n]*\n(.*?)(?:^[ \t]*```|\Z)", re.DOTALL | re.MULTILINE)
+
+# Persistent event loop for the synchronous entry points. The async clients
+# keep pooled connections bound to the loop they were first used on, so every
+# blocking call has to go through the same loop.
+_LOOP = None
+
+def _run(coro):
+    """Run a coroutine to completion on the shared event loop"""
+    global _LOOP
+    if _LOOP is None or _LOOP.is_closed():
+        _LOOP = asyncio.new_event_loop()
+    return _LOOP.run_until_complete(coro)
+
+# One client shared by every agent, so TLS sessions and HTTP/2 connections
+# are reused across agents and iterations instead of opened per agent
+_CLIENT = None
+
+def get_client() -> "AsyncOpenAI":
+    """Return the shared OpenAI client, creating it on first use"""
+    global _CLIENT
+    if _CLIENT is None:
+        import httpx
+        from openai import AsyncOpenAI
+        
+        load_env()
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+            # Non-streamed completions only arrive once generation finishes,
+            # so keep the SDK's 600s read timeout; fail fast on connect
+            timeout=httpx.Timeout(600, connect=10)
+        )
+        # Retries are handled by Agent._create; the SDK's own retries would
+        # multiply with them
+        _CLIENT = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client, max_retries=0)
+    return _CLIENT
+
+# Start of the text Agent.think returns instead of a response when a call fails
+ERROR_PREFIX = "Error: Could not get response from "
+
+# Longest pause between retries, whether backing off or following Retry-After
+MAX_RETRY_WAIT = 30
+
+_exponential_wait = wait_exponential(multiplier=1, max=MAX_RETRY_WAIT)
+
+def _is_retryable_rate_limit(exc: BaseException) -> bool:
+    """Rate limits clear up on their own; an exhausted quota does not"""
+    from openai import RateLimitError
+    
+    return isinstance(exc, RateLimitError) and 'insufficient_quota' not in str(exc)
+
+def _wait_for_rate_limit(retry_state) -> float:
+    """Honour the server's Retry-After header, otherwise back off exponentially"""
+    exc = retry_state.outcome.exception()
+    response = getattr(exc, 'response', None)
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    try:
+        return min(float(retry_after), MAX_RETRY_WAIT)
+    except (TypeError, ValueError):
+        return _exponential_wait(retry_state)
+
+# System prompts for each agent type. Kept at module level so every call
+# sends the exact same prefix.
+_SYSTEM_PROMPTS = MappingProxyType({
+    "Writer Agent": """You are a skilled software developer focused on writing clean, functional code. 
+    Your role is to:
+    - Write initial implementations for coding tasks
+    - Improve existing code based on reviewer feedback
+    - Focus on functionality and clarity
+    - Include code in ```python code blocks
+    - Provide brief explanations of your approach
+    
+    Always structure your response with code blocks and explanations.""",
+    
+    "Reviewer Agent": """You are an experienced code reviewer focused on improvement and best practices.
+    Your role is to:
+    - Review code for correctness, efficiency, and best practices
+    - Identify potential bugs or edge cases
+    - Suggest specific improvements
+    - Provide improved code when necessary
+    - Include improved code in ```python code blocks
+    
+    Be constructive and specific in your feedback. If the code is already good, acknowledge it.""",
+    
+    "Self-Critique Agent": """You are a skilled software developer who writes code and then reviews it yourself.
+    Your role is to:
+    - Write clean, functional Python code for the task, or improve your previous code
+    - Critically review that code for correctness, efficiency, and best practices
+    - Identify potential bugs or edge cases
+    - Decide honestly whether another revision is needed
+    
+    Respond with JSON only: put plain Python source (no ``` fences) in "code", your review in
+    "critique", and set "needs_revision" to false only when the code needs no further changes."""
+})
+
+# Structured output for the fused Writer + Reviewer call
+SELF_CRITIQUE_FORMAT = MappingProxyType({
+    "type": "json_schema",
+    "json_schema": {
+        "name": "self_critique",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "code": {"type": "string"},
+                "critique": {"type": "string"},
+                "needs_revision": {"type": "boolean"}
+            },
+            "required": ["code", "critique", "needs_revision"],
+            "additionalProperties": False
+        }
+    }
+})
+
+@dataclass(slots=True)
+class Turn:
+    """One agent response in a collaboration, with the code extracted from it"""
+    agent: str
+    content: str
+    code: str
+    iteration: int
 
 class Agent:
     """Base class for DevDuo agents"""
     
-    def __init__(self, name: str, role: str):
-        self.name = name
+    __slots__ = ("name", "role", "cache", "cache_all", "api_key", "model", "client")
+    
+    def __init__(self, name: str, role: str, cache: Optional[LLMCache] = None, cache_all: bool = False):
+        # Agent names are repeated on every Turn, so share one string object
+        self.name = sys.intern(name)
         self.role = role
+        self.cache = cache
+        # Responses are only deterministic at temperature 0; cache_all opts
+        # into reusing sampled responses as well
+        self.cache_all = cache_all
+        load_env()
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.model = os.getenv('OPENAI_MODEL', 'gpt-4')
         
@@ -21,47 +165,70 @@ class Agent:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = OpenAI(api_key=self.api_key)
-        
-        # Define system prompts for each agent type
-        self.system_prompts = {
-            "Writer Agent": """You are a skilled software developer focused on writing clean, functional code. 
-            Your role is to:
-            - Write initial implementations for coding tasks
-            - Improve existing code based on reviewer feedback
-            - Focus on functionality and clarity
-            - Include code in ```python code blocks
-            - Provide brief explanations of your approach
-            
-            Always structure your response with code blocks and explanations.""",
-            
-            "Reviewer Agent": """You are an experienced code reviewer focused on improvement and best practices.
-            Your role is to:
-            - Review code for correctness, efficiency, and best practices
-            - Identify potential bugs or edge cases
-            - Suggest specific improvements
-            - Provide improved code when necessary
-            - Include improved code in ```python code blocks
-            
-            Be constructive and specific in your feedback. If the code is already good, acknowledge it."""
+        self.client = get_client()
+    
+    def build_request(self, prompt: str, temperature: float = 0.7, history: Optional[List[Dict]] = None,
+                      max_tokens: int = 1500, response_format: Optional[Dict] = None) -> Dict:
+        """Build the chat completion request body for a prompt"""
+        payload = {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": _SYSTEM_PROMPTS[self.name]},
+                *(history or []),
+                {"role": "user", "content": prompt}
+            ],
+            'temperature': temperature,
+            'max_tokens': max_tokens
         }
+        if response_format is not None:
+            payload['response_format'] = dict(response_format)
+        return payload
     
-    def think(self, prompt: str) -> str:
-        """Send prompt to OpenAI API and get response"""
-        print(f"\n🤖 {self.name} is thinking...")
+    async def think(self, prompt: str, temperature: float = 0.7, history: Optional[List[Dict]] = None,
+                    stream: bool = False, max_tokens: int = 1500,
+                    response_format: Optional[Dict] = None) -> str:
+        """Send prompt to OpenAI API and get response
+        
+        The system prompt always leads the message list unchanged, followed by
+        any earlier turns and then the new prompt, so repeated calls share the
+        longest possible prefix for OpenAI's automatic prompt caching.
+        
+        With stream=True the response is printed token by token as it arrives;
+        the full text is still returned.
+        """
+        payload = self.build_request(prompt, temperature, history, max_tokens, response_format)
+        
+        use_cache = self.cache is not None and (temperature == 0 or self.cache_all)
+        if use_cache:
+            key = LLMCache.cache_key(payload)
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"\n♻️  {self.name} reused a cached response")
+                if stream:
+                    print(f"\n💬 {self.name}:")
+                    print(cached)
+                return cached
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.system_prompts[self.name]},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=1500
-            )
+            if stream:
+                content = await self._stream_response(payload)
+            else:
+                print(f"\n🤖 {self.name} is thinking...")
+                response = await self._create(payload)
+                message = response.choices[0].message
+                
+                # Structured-output refusals come back with no content and
+                # the reason in a separate field; return that as the text
+                if message.content is None:
+                    refusal = getattr(message, 'refusal', None)
+                    print(f"⚠️  {self.name} declined to answer")
+                    return f"Refusal: {refusal}" if refusal else f"Refusal: {self.name} returned no content."
+                content = message.content
+            
+            if use_cache:
+                self.cache.set(key, content)
             
-            return response.choices[0].message.content
+            return content
             
         except Exception as e:
             error_message = str(e)
@@ -76,7 +243,34 @@ class Agent:
             ]):
                 self._handle_critical_error(error_message)
             
-            return f"Error: Could not get response from {self.name}. Please check your API key and connection."
+            return f"{ERROR_PREFIX}{self.name}. Please check your API key and connection."
+    
+    @retry(
+        retry=retry_if_exception(_is_retryable_rate_limit),
+        wait=_wait_for_rate_limit,
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    async def _create(self, payload: Dict, **kwargs):
+        """Create a chat completion, pausing only when the API reports a rate limit"""
+        return await self.client.chat.completions.create(**payload, **kwargs)
+    
+    async def _stream_response(self, payload: Dict) -> str:
+        """Stream a completion to stdout and return the accumulated text"""
+        response = await self._create(payload, stream=True)
+        
+        print(f"\n💬 {self.name}:")
+        chunks = []
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                print(delta, end='', flush=True)
+                chunks.append(delta)
+        print()
+        
+        return ''.join(chunks)
     
     def _handle_critical_error(self, error_message: str):
         """Handle critical API errors that should stop the program"""
@@ -110,100 +304,163 @@ class Agent:
 class DevDuo:
     """Main DevDuo system orchestrating two agents"""
     
-    def __init__(self, selected_model: str = None):
+    EMBEDDING_MODEL = 'text-embedding-3-small'
+    NO_FINAL_CODE = "# No final code found"
+    
+    # Positive indicators that the reviewer is happy with the code
+    SATISFIED_INDICATORS = [
+        'looks good', 'well done', 'excellent', 'perfect', 'solid implementation',
+        'great job', 'this is good', 'good work', 'nicely done', 'well implemented'
+    ]
+    
+    # Major concern indicators that always warrant another iteration
+    CONCERN_INDICATORS = [
+        'major issue', 'significant problem', 'needs improvement', 'several issues',
+        'should be fixed', 'must be addressed', 'critical problem'
+    ]
+    
+    # Compiled once so each check is a single case-insensitive scan
+    _SATISFIED_RE = re.compile("|".join(map(re.escape, SATISFIED_INDICATORS)), re.IGNORECASE)
+    _CONCERN_RE = re.compile("|".join(map(re.escape, CONCERN_INDICATORS)), re.IGNORECASE)
+    
+    def __init__(self, selected_model: str = None, cache: Optional[LLMCache] = None, cache_all: bool = False,
+                 semantic_cache: Optional[SemanticCache] = None, writer_max_tokens: int = 1500,
+                 reviewer_max_tokens: int = 800, rewrite_max_tokens: int = 1200):
+        load_env()
+        
         # If a model is explicitly selected, use it. Otherwise use env default
         model_to_use = selected_model or os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
         
-        self.writer = Agent("Writer Agent", "Code Writer")
-        self.reviewer = Agent("Reviewer Agent", "Code Reviewer")
+        # Both agents share one response cache
+        self.cache = cache if cache is not None else LLMCache()
+        self.writer = Agent("Writer Agent", "Code Writer", self.cache, cache_all)
+        self.reviewer = Agent("Reviewer Agent", "Code Reviewer", self.cache, cache_all)
+        self.critic = Agent("Self-Critique Agent", "Code Writer and Reviewer", self.cache, cache_all)
+        # Optional: reuse whole results for paraphrased tasks
+        self.semantic_cache = semantic_cache
         
         # Override the model for both agents
         self.writer.model = model_to_use
         self.reviewer.model = model_to_use
+        self.critic.model = model_to_use
+        
+        # Token budgets per prompt type: a first draft needs the most room,
+        # critiques and rewrites of existing code need less
+        self.writer_max_tokens = writer_max_tokens
+        self.reviewer_max_tokens = reviewer_max_tokens
+        self.rewrite_max_tokens = rewrite_max_tokens
         
         self.conversation_history = []
         self.current_model = model_to_use
     
     def collaborate(self, task: str, max_iterations: int = 3, verbose: bool = True) -> Dict:
         """Main collaboration method"""
+        return _run(self.collaborate_async(task, max_iterations, verbose))
+    
+    def collaborate_many(self, tasks: List[str], max_iterations: int = 3, verbose: bool = False) -> List[Dict]:
+        """Run independent collaborations concurrently, returning results in task order"""
+        return _run(self.collaborate_many_async(tasks, max_iterations, verbose))
+    
+    async def collaborate_many_async(self, tasks: List[str], max_iterations: int = 3, verbose: bool = False) -> List[Dict]:
+        """Fan out one collaboration per task and gather the results"""
+        # Token streams from concurrent tasks would interleave, so only
+        # print whole responses here
+        return await asyncio.gather(*[
+            self.collaborate_async(task, max_iterations, verbose, stream=False) for task in tasks
+        ])
+    
+    async def collaborate_async(self, task: str, max_iterations: int = 3, verbose: bool = True,
+                                stream: bool = True) -> Dict:
+        """Async collaboration method, safe to run concurrently for different tasks
+        
+        In verbose mode responses are streamed as they are generated unless
+        stream is False, in which case they are printed once complete.
+        """
+        stream = verbose and stream
         print(f"\n🚀 DevDuo Starting Collaboration")
         print(f"📝 Task: {task}")
         print("=" * 50)
         
-        self.conversation_history = []
+        embedding = None
+        if self.semantic_cache is not None:
+            embedding = await self._embed(task)
+            cached = self.semantic_cache.lookup(embedding) if embedding else None
+            if cached is not None:
+                print(f"\n♻️  Reusing result from a similar task: {cached['task']}")
+                self.conversation_history = cached['conversation_history']
+                return dict(cached, task=task)
+        
+        # Keep history local so concurrent collaborations don't clobber each other
+        conversation_history = []
         current_code = ""
+        # Writer sees the collaboration as one growing multi-turn chat, so each
+        # call extends the previous call's messages instead of rewriting them
+        writer_turns = []
+        prev_code_hash = None
+        iterations_run = 0
         
         for iteration in range(max_iterations):
             print(f"\n📍 Iteration {iteration + 1}/{max_iterations}")
+            iterations_run = iteration + 1
             
             # Writer creates or improves code
             if iteration == 0:
-                writer_prompt = f"""Please write code for this task: {task}
-
-Requirements:
-- Write clean, functional Python code
-- Include proper error handling where appropriate
-- Add brief comments explaining your approach
-- Make sure the code is ready to run"""
+                writer_prompt = self._initial_writer_prompt(task)
+                max_tokens = self.writer_max_tokens
             else:
-                writer_prompt = f"""Please improve this code based on the reviewer's feedback:
-
-Original task: {task}
-
-Previous code:
-{current_code}
-
-Reviewer feedback:
-{self.conversation_history[-1]['content']}
-
-Please provide an improved version that addresses the reviewer's concerns."""
+                max_tokens = self.rewrite_max_tokens
+                writer_prompt = self._rewrite_prompt(conversation_history[-1].content)
             
-            writer_response = self.writer.think(writer_prompt)
+            writer_response = await self.writer.think(writer_prompt, history=writer_turns, stream=stream,
+                                                      max_tokens=max_tokens)
+            writer_turns += [
+                {"role": "user", "content": writer_prompt},
+                {"role": "assistant", "content": writer_response}
+            ]
             
-            if verbose:
+            if verbose and not stream:
                 print(f"\n💬 {self.writer.name}:")
                 print(writer_response)
             
-            self.conversation_history.append({
-                'agent': self.writer.name,
-                'content': writer_response,
-                'iteration': iteration + 1
-            })
-            
             # Extract code from writer response
             current_code = self._extract_code(writer_response)
             
-            # Small delay to respect API rate limits
-            time.sleep(1)
+            conversation_history.append(Turn(
+                agent=self.writer.name,
+                content=writer_response,
+                code=current_code,
+                iteration=iteration + 1
+            ))
+            
+            # Stop once the Writer returns the same code twice in a row;
+            # another review round would just repeat the last one
+            code_hash = hashlib.blake2b(current_code.encode(), digest_size=16).digest()
+            if current_code and code_hash == prev_code_hash:
+                print(f"\n✅ Collaboration complete! Code has converged.")
+                break
+            prev_code_hash = code_hash
+            
+            # A review on the last iteration can't feed back to the Writer, so
+            # it's only worth running if the Writer produced no code
+            if iteration == max_iterations - 1 and current_code:
+                break
             
             # Reviewer analyzes the code
-            reviewer_prompt = f"""Please review this code for the task: '{task}'
-
-Code to review:
-{writer_response}
-
-Please provide:
-1. What the code does well
-2. Any issues or improvements needed
-3. Specific suggestions for enhancement
-4. If improvements are needed, provide updated code
-
-Be thorough but constructive in your review."""
+            reviewer_prompt = self._reviewer_prompt(task, writer_response)
             
-            reviewer_response = self.reviewer.think(reviewer_prompt)
+            reviewer_response = await self.reviewer.think(reviewer_prompt, stream=stream,
+                                                          max_tokens=self.reviewer_max_tokens)
             
-            if verbose:
+            if verbose and not stream:
                 print(f"\n💬 {self.reviewer.name}:")
                 print(reviewer_response)
             
-            self.conversation_history.append({
-                'agent': self.reviewer.name,
-                'content': reviewer_response,
-                'iteration': iteration + 1
-            })
-            
-            # Small delay to respect API rate limits
-            time.sleep(1)
+            conversation_history.append(Turn(
+                agent=self.reviewer.name,
+                content=reviewer_response,
+                code=self._extract_code(reviewer_response),
+                iteration=iteration + 1
+            ))
             
             # Check if reviewer is satisfied (improved heuristic)
             if self._is_satisfied(reviewer_response) and iteration > 0:
@@ -211,65 +468,412 @@ Be thorough but constructive in your review."""
                 break
         
         # Get final code (prefer reviewer's improved version if available)
-        final_code = self._get_final_code()
+        final_code = self._get_final_code(conversation_history)
+        self.conversation_history = conversation_history
         
-        return {
+        result = {
             'task': task,
             'final_code': final_code,
-            'conversation_history': self.conversation_history,
-            'iterations': len(self.conversation_history) // 2
+            'conversation_history': conversation_history,
+            'iterations': iterations_run
         }
+        
+        # Only remember runs that succeeded; a stored failure would be
+        # replayed for every paraphrase of this task
+        failed = any(turn.content.startswith(ERROR_PREFIX) for turn in conversation_history)
+        if embedding and not failed and final_code != self.NO_FINAL_CODE:
+            self.semantic_cache.add(embedding, result)
+            self.semantic_cache.save()
+        
+        return result
     
-    def _extract_code(self, response: str) -> str:
-        """Extract code blocks from agent responses"""
-        lines = response.split('\n')
-        code_lines = []
-        in_code_block = False
-        
-        for line in lines:
-            if line.strip().startswith('```python'):
-                in_code_block = True
+    async def _embed(self, task: str) -> Optional[List[float]]:
+        """Embed a task for the semantic cache, or None if the call fails"""
+        try:
+            response = await self.writer.client.embeddings.create(model=self.EMBEDDING_MODEL, input=task)
+            return response.data[0].embedding
+        except Exception as e:
+            print(f"⚠️  Could not embed task, skipping semantic cache: {str(e)}")
+            return None
+    
+    def collaborate_batch(self, tasks: List[str], max_iterations: int = 3, poll_interval: float = 30) -> List[Dict]:
+        """Run collaborations for many tasks through the OpenAI Batch API"""
+        return _run(self.collaborate_batch_async(tasks, max_iterations, poll_interval))
+    
+    async def collaborate_batch_async(self, tasks: List[str], max_iterations: int = 3,
+                                      poll_interval: float = 30) -> List[Dict]:
+        """Async version of collaborate_batch
+        
+        Each Writer round and each Reviewer round is submitted as one batch
+        covering every task still in progress. Batches cost half as much and
+        draw on a separate rate limit, but can take up to 24 hours, so this
+        suits offline bulk runs rather than interactive use.
+        """
+        print(f"\n🚀 DevDuo Starting Batch Collaboration ({len(tasks)} tasks)")
+        print("=" * 50)
+        
+        states = [{
+            'task': task,
+            'conversation_history': [],
+            'writer_turns': [],
+            'prev_code_hash': None,
+            'iterations': 0,
+            'done': False
+        } for task in tasks]
+        
+        for iteration in range(max_iterations):
+            active = [i for i, state in enumerate(states) if not state['done']]
+            if not active:
+                break
+            print(f"\n📍 Iteration {iteration + 1}/{max_iterations} ({len(active)} tasks)")
+            
+            # Writer round
+            writer_prompts = {}
+            requests = []
+            for i in active:
+                state = states[i]
+                if iteration == 0:
+                    prompt = self._initial_writer_prompt(state['task'])
+                    max_tokens = self.writer_max_tokens
+                else:
+                    prompt = self._rewrite_prompt(state['conversation_history'][-1].content)
+                    max_tokens = self.rewrite_max_tokens
+                writer_prompts[i] = prompt
+                requests.append(self._batch_line(
+                    f"task-{i}-writer-{iteration}",
+                    self.writer.build_request(prompt, history=state['writer_turns'], max_tokens=max_tokens)
+                ))
+            
+            outputs = await self._run_batch(requests, poll_interval)
+            
+            reviewing = []
+            for i in active:
+                state = states[i]
+                writer_response = outputs.get(f"task-{i}-writer-{iteration}")
+                if writer_response is None:
+                    # A failed or expired batch won't recover by resubmitting
+                    # more (billed, up to 24h) rounds, so stop this task here
+                    print(f"❌ No {self.writer.name} output for task {i + 1}; stopping it")
+                    state['done'] = True
+                    continue
+                state['writer_turns'] += [
+                    {"role": "user", "content": writer_prompts[i]},
+                    {"role": "assistant", "content": writer_response}
+                ]
+                current_code = self._extract_code(writer_response)
+                state['conversation_history'].append(Turn(
+                    agent=self.writer.name,
+                    content=writer_response,
+                    code=current_code,
+                    iteration=iteration + 1
+                ))
+                state['iterations'] = iteration + 1
+                
+                # Same stopping rules as collaborate: converged code, or a
+                # final review that could never feed back to the Writer
+                code_hash = hashlib.blake2b(current_code.encode(), digest_size=16).digest()
+                converged = current_code and code_hash == state['prev_code_hash']
+                state['prev_code_hash'] = code_hash
+                if converged or (iteration == max_iterations - 1 and current_code):
+                    state['done'] = True
+                else:
+                    reviewing.append(i)
+            
+            if not reviewing:
                 continue
-            elif line.strip().startswith('```') and in_code_block:
-                in_code_block = False
+            
+            # Reviewer round
+            requests = [
+                self._batch_line(
+                    f"task-{i}-reviewer-{iteration}",
+                    self.reviewer.build_request(
+                        self._reviewer_prompt(states[i]['task'], states[i]['conversation_history'][-1].content),
+                        max_tokens=self.reviewer_max_tokens
+                    )
+                )
+                for i in reviewing
+            ]
+            
+            outputs = await self._run_batch(requests, poll_interval)
+            
+            for i in reviewing:
+                state = states[i]
+                reviewer_response = outputs.get(f"task-{i}-reviewer-{iteration}")
+                if reviewer_response is None:
+                    print(f"❌ No {self.reviewer.name} output for task {i + 1}; stopping it")
+                    state['done'] = True
+                    continue
+                state['conversation_history'].append(Turn(
+                    agent=self.reviewer.name,
+                    content=reviewer_response,
+                    code=self._extract_code(reviewer_response),
+                    iteration=iteration + 1
+                ))
+                if self._is_satisfied(reviewer_response) and iteration > 0:
+                    state['done'] = True
+        
+        return [{
+            'task': state['task'],
+            'final_code': self._get_final_code(state['conversation_history']),
+            'conversation_history': state['conversation_history'],
+            'iterations': state['iterations']
+        } for state in states]
+    
+    def _batch_line(self, custom_id: str, body: Dict) -> Dict:
+        """Wrap a request body as one line of a Batch API input file"""
+        return {
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': body
+        }
+    
+    async def _run_batch(self, requests: List[Dict], poll_interval: float) -> Dict[str, str]:
+        """Submit a batch, wait for it to finish and return response text by custom_id"""
+        client = self.writer.client
+        data = b"\n".join(dumps(request) for request in requests)
+        
+        try:
+            input_file = await client.files.create(file=('devduo_batch.jsonl', data), purpose='batch')
+            batch = await client.batches.create(
+                input_file_id=input_file.id,
+                endpoint='/v1/chat/completions',
+                completion_window='24h'
+            )
+            
+            while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+                counts = batch.request_counts
+                progress = f" ({counts.completed}/{counts.total})" if counts else ""
+                print(f"⏳ Batch {batch.id}: {batch.status}{progress}")
+                await asyncio.sleep(poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+            
+            if batch.status != 'completed' or not batch.output_file_id:
+                print(f"❌ Batch {batch.id} ended with status '{batch.status}'")
+                return {}
+            
+            output = await client.files.content(batch.output_file_id)
+        except Exception as e:
+            print(f"❌ Error running batch: {str(e)}")
+            return {}
+        
+        results = {}
+        for line in output.text.splitlines():
+            if not line.strip():
                 continue
-            elif in_code_block:
-                code_lines.append(line)
+            entry = json.loads(line)
+            response = entry.get('response') or {}
+            if response.get('status_code') == 200:
+                results[entry['custom_id']] = response['body']['choices'][0]['message']['content']
+            else:
+                print(f"❌ Batch request {entry['custom_id']} failed: {entry.get('error') or response}")
+        return results
+    
+    def collaborate_parallel(self, task: str, n_writers: int = 3, verbose: bool = True) -> Dict:
+        """Generate several Writer candidates concurrently and let the Reviewer pick the best"""
+        return _run(self.collaborate_parallel_async(task, n_writers, verbose))
+    
+    async def collaborate_parallel_async(self, task: str, n_writers: int = 3, verbose: bool = True) -> Dict:
+        """Async version of collaborate_parallel"""
+        if n_writers < 1:
+            raise ValueError("n_writers must be at least 1")
+        
+        print(f"\n🚀 DevDuo Starting Parallel Collaboration ({n_writers} writers)")
+        print(f"📝 Task: {task}")
+        print("=" * 50)
+        
+        # Spread temperatures from focused to creative so candidates differ
+        if n_writers > 1:
+            temperatures = [round(0.2 + 0.8 * i / (n_writers - 1), 2) for i in range(n_writers)]
+        else:
+            temperatures = [0.7]
+        
+        writer_prompt = self._initial_writer_prompt(task)
+        # gather preserves positional order, so candidates line up with temperatures
+        candidates = await asyncio.gather(*[
+            self.writer.think(writer_prompt, temperature=t, max_tokens=self.writer_max_tokens)
+            for t in temperatures
+        ])
+        
+        conversation_history = []
+        for i, candidate in enumerate(candidates, 1):
+            if verbose:
+                print(f"\n💬 {self.writer.name} (candidate {i}):")
+                print(candidate)
+            
+            conversation_history.append(Turn(
+                agent=self.writer.name,
+                content=candidate,
+                code=self._extract_code(candidate),
+                iteration=1
+            ))
+        
+        candidate_sections = "\n\n".join(
+            f"Candidate {i}:\n{candidate}" for i, candidate in enumerate(candidates, 1)
+        )
+        reviewer_prompt = f"""Several candidate solutions were written for the task: '{task}'
+
+{candidate_sections}
+
+Please:
+1. Compare the candidates for correctness, efficiency, and clarity
+2. Pick the best one, or merge their strengths into a single solution
+3. Provide the final code in one ```python code block
+
+Be thorough but concise in your comparison."""
+        
+        # Only the single Reviewer call can stream; the writers run concurrently.
+        # It has to restate the chosen code, so it gets a full draft budget
+        reviewer_response = await self.reviewer.think(reviewer_prompt, stream=verbose,
+                                                      max_tokens=self.writer_max_tokens)
+        
+        conversation_history.append(Turn(
+            agent=self.reviewer.name,
+            content=reviewer_response,
+            code=self._extract_code(reviewer_response),
+            iteration=1
+        ))
+        
+        self.conversation_history = conversation_history
+        
+        return {
+            'task': task,
+            'final_code': self._get_final_code(conversation_history),
+            'conversation_history': conversation_history,
+            'iterations': 1
+        }
+    
+    def collaborate_fused(self, task: str, max_iterations: int = 3, verbose: bool = True) -> Dict:
+        """Collaborate with one self-critiquing call per iteration instead of Writer + Reviewer"""
+        return _run(self.collaborate_fused_async(task, max_iterations, verbose))
+    
+    async def collaborate_fused_async(self, task: str, max_iterations: int = 3, verbose: bool = True) -> Dict:
+        """Async version of collaborate_fused
+        
+        Needs a model with structured output support (e.g. gpt-4o-mini).
+        """
+        print(f"\n🚀 DevDuo Starting Self-Critique Collaboration")
+        print(f"📝 Task: {task}")
+        print("=" * 50)
+        
+        conversation_history = []
+        critic_turns = []
+        iterations_run = 0
+        
+        for iteration in range(max_iterations):
+            print(f"\n📍 Iteration {iteration + 1}/{max_iterations}")
+            iterations_run = iteration + 1
+            
+            if iteration == 0:
+                prompt = self._initial_writer_prompt(task)
+                max_tokens = self.writer_max_tokens
+            else:
+                prompt = "Please revise your code to address every point in your critique."
+                max_tokens = self.rewrite_max_tokens
+            
+            response = await self.critic.think(prompt, history=critic_turns, max_tokens=max_tokens,
+                                               response_format=SELF_CRITIQUE_FORMAT)
+            critic_turns += [
+                {"role": "user", "content": prompt},
+                {"role": "assistant", "content": response}
+            ]
+            
+            try:
+                parsed = json.loads(response)
+            except (TypeError, ValueError):
+                # Errors and refusals come back as plain text; record them and stop
+                conversation_history.append(Turn(
+                    agent=self.critic.name,
+                    content=response,
+                    code=self._extract_code(response),
+                    iteration=iteration + 1
+                ))
+                break
+            
+            if verbose:
+                print(f"\n💬 {self.critic.name}:")
+                print(parsed['code'])
+                print(f"\n🔎 Critique:\n{parsed['critique']}")
+            
+            conversation_history.append(Turn(
+                agent=self.critic.name,
+                content=parsed['critique'],
+                code=parsed['code'],
+                iteration=iteration + 1
+            ))
+            
+            if not parsed['needs_revision']:
+                print(f"\n✅ Collaboration complete! No further revision needed.")
+                break
         
-        return '\n'.join(code_lines) if code_lines else "# No code block found"
+        self.conversation_history = conversation_history
+        
+        return {
+            'task': task,
+            'final_code': self._get_final_code(conversation_history),
+            'conversation_history': conversation_history,
+            'iterations': iterations_run
+        }
+    
+    def _initial_writer_prompt(self, task: str) -> str:
+        """Build the Writer prompt for a fresh task"""
+        return f"""Please write code for this task: {task}
+
+Requirements:
+- Write clean, functional Python code
+- Include proper error handling where appropriate
+- Add brief comments explaining your approach
+- Make sure the code is ready to run"""
+    
+    def _rewrite_prompt(self, reviewer_feedback: str) -> str:
+        """Build the Writer prompt asking for a revision"""
+        return f"""Please improve your previous code based on the reviewer's feedback:
+
+Reviewer feedback:
+{reviewer_feedback}
+
+Please provide an improved version that addresses the reviewer's concerns."""
+    
+    def _reviewer_prompt(self, task: str, writer_response: str) -> str:
+        """Build the Reviewer prompt for a Writer response"""
+        return f"""Please review this code for the task: '{task}'
+
+Code to review:
+{writer_response}
+
+Please provide:
+1. What the code does well
+2. Any issues or improvements needed
+3. Specific suggestions for enhancement
+4. If improvements are needed, provide updated code
+
+Be thorough but constructive in your review."""
     
-    def _get_final_code(self) -> str:
+    def _extract_code(self, response: str) -> str:
+        """Extract the last python code block from an agent response, or '' if there is none"""
+        matches = CODE_RE.findall(response)
+        return matches[-1].rstrip() if matches else ""
+    
+    def _get_final_code(self, conversation_history: Optional[List[Turn]] = None) -> str:
         """Get the best final code from the conversation"""
-        # Look for the most recent code block from either agent
-        for entry in reversed(self.conversation_history):
-            code = self._extract_code(entry['content'])
-            if code and code != "# No code block found":
-                return code
+        if conversation_history is None:
+            conversation_history = self.conversation_history
         
-        return "# No final code found"
+        # Code is extracted when each entry is recorded, so the most recent
+        # entry from either agent that has any wins
+        return next(
+            (turn.code for turn in reversed(conversation_history) if turn.code),
+            self.NO_FINAL_CODE
+        )
     
     def _is_satisfied(self, reviewer_response: str) -> bool:
         """Improved heuristic to check if reviewer is satisfied"""
-        # Look for positive indicators
-        satisfied_indicators = [
-            'looks good', 'well done', 'excellent', 'perfect', 'solid implementation',
-            'great job', 'this is good', 'good work', 'nicely done', 'well implemented'
-        ]
-        
-        # Look for major concern indicators
-        concern_indicators = [
-            'major issue', 'significant problem', 'needs improvement', 'several issues',
-            'should be fixed', 'must be addressed', 'critical problem'
-        ]
-        
-        response_lower = reviewer_response.lower()
-        
         # If there are major concerns, not satisfied
-        if any(concern in response_lower for concern in concern_indicators):
+        if self._CONCERN_RE.search(reviewer_response):
             return False
         
         # If there are satisfied indicators, consider satisfied
-        if any(indicator in response_lower for indicator in satisfied_indicators):
+        if self._SATISFIED_RE.search(reviewer_response):
             return True
         
         # Default to not satisfied to allow for more iterations
@@ -278,29 +882,21 @@ Be thorough but constructive in your review."""
     def save_result(self, result: Dict, filename: str = "devduo_result.json"):
         """Save collaboration result to file"""
         try:
-            with open(filename, 'w') as f:
-                json.dump(result, f, indent=2)
+            with open(filename, 'wb') as f:
+                f.write(dumps(result, indent=True))
             print(f"\n💾 Results saved to {filename}")
         except Exception as e:
             print(f"❌ Error saving results: {str(e)}")
 
-def get_available_models():
+def get_available_models(refresh: bool = False):
     """Get list of available chat models from OpenAI API"""
+    load_env()
     api_key = os.getenv('OPENAI_API_KEY')
     if not api_key:
         return []
     
     try:
-        client = OpenAI(api_key=api_key)
-        models = client.models.list()
-        
-        # Filter for chat models
-        chat_models = []
-        for model in models.data:
-            if any(keyword in model.id for keyword in ['gpt-3.5', 'gpt-4', 'turbo']):
-                chat_models.append(model.id)
-        
-        return sorted(chat_models)
+        return filter_chat_models(list_model_ids(api_key, refresh))
     except Exception as e:
         print(f"⚠️  Could not fetch models: {str(e)}")
         return []
@@ -331,6 +927,15 @@ def select_model(available_models):
 
 def main():
     """Main function to run DevDuo"""
+    parser = argparse.ArgumentParser(description="DevDuo - AI Pair Programming System")
+    parser.add_argument('--refresh-models', action='store_true', help="ignore the cached model list")
+    parser.add_argument('--fused', action='store_true',
+                        help="use one self-critiquing call per iteration instead of Writer + Reviewer")
+    parser.add_argument('--batch', action='store_true',
+                        help="run every example task through the OpenAI Batch API (slow, half price)")
+    args = parser.parse_args()
+    load_env()
+    
     print("🤖 Welcome to DevDuo - AI Pair Programming System")
     print("=" * 50)
     
@@ -342,7 +947,7 @@ def main():
     
     # Get available models and let user choose
     print("\n🔍 Checking available models...")
-    available_models = get_available_models()
+    available_models = get_available_models(refresh=args.refresh_models)
     selected_model = select_model(available_models)
     
     # Initialize DevDuo with selected model
@@ -361,6 +966,24 @@ def main():
         "Write a function to implement binary search"
     ]
     
+    if args.batch:
+        print(f"\n🔄 Submitting {len(example_tasks)} example tasks as batches with {duo.current_model}")
+        results = duo.collaborate_batch(example_tasks)
+        
+        print("\n" + "=" * 50)
+        print("🎯 FINAL RESULTS")
+        print("=" * 50)
+        for result in results:
+            print(f"\nTask: {result['task']}")
+            print(f"Iterations: {result['iterations']}")
+            print(f"\nFinal Code:")
+            print(result['final_code'])
+        
+        save_choice = input("\nWould you like to save the results to a file? (y/n): ").strip().lower()
+        if save_choice == 'y':
+            duo.save_result({'results': results}, "devduo_batch_results.json")
+        return
+    
     print("\nExample tasks:")
     for i, task in enumerate(example_tasks, 1):
         print(f"{i}. {task}")
@@ -377,7 +1000,10 @@ def main():
     # Run collaboration
     print(f"\n🔄 Starting collaboration with {duo.current_model}")
     print(f"📝 Task: {task}")
-    result = duo.collaborate(task, verbose=True)
+    if args.fused:
+        result = duo.collaborate_fused(task, verbose=True)
+    else:
+        result = duo.collaborate(task, verbose=True)
     
     # Show final results
     print("\n" + "=" * 50)
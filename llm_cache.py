@@ -0,0 +1,138 @@
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import shelve
+from typing import Dict, List, MutableMapping, Optional
+
+# orjson is optional; fall back to the standard library when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_default(obj):
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, sort_keys: bool = False, indent: bool = False) -> bytes:
+    """Serialize to JSON bytes, with orjson when available
+
+    The stdlib fallback is configured to produce the same bytes as orjson,
+    so cache keys don't change when orjson is installed or removed.
+    """
+    if orjson is not None:
+        option = (orjson.OPT_SORT_KEYS if sort_keys else 0) | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+    return json.dumps(
+        obj,
+        sort_keys=sort_keys,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=(',', ': ') if indent else (',', ':'),
+        default=_json_default
+    ).encode('utf-8')
+
+
+class LLMCache:
+    """Exact-match cache for chat completion responses"""
+
+    def __init__(self, backend: Optional[MutableMapping] = None):
+        # Any mapping works as a backend: a dict for in-process caching,
+        # or a shelve (see LLMCache.open) for persistence across runs
+        self.backend = backend if backend is not None else {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, path: str) -> "LLMCache":
+        """Create a cache persisted to disk at the given path"""
+        return cls(shelve.open(path))
+
+    @staticmethod
+    def cache_key(payload: Dict) -> str:
+        """Hash a request payload (model, messages, temperature, max_tokens)"""
+        return hashlib.sha256(dumps(payload, sort_keys=True)).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None on a miss"""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, content: str):
+        """Store a response under a key"""
+        self.backend[key] = content
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters for this cache"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self.backend)
+        }
+
+    def close(self):
+        """Close the backend if it holds resources (e.g. a shelve file)"""
+        if hasattr(self.backend, 'close'):
+            self.backend.close()
+
+
+class SemanticCache:
+    """Nearest-neighbour cache of collaboration results keyed by task embeddings"""
+
+    def __init__(self, dimension: int = 1536, threshold: float = 0.92, path: Optional[str] = None):
+        # faiss and numpy are optional dependencies, only needed for this cache
+        import faiss
+        import numpy
+
+        self._faiss = faiss
+        self._numpy = numpy
+        self.threshold = threshold
+        self.path = path
+        self.results: List[Dict] = []
+
+        if path and os.path.exists(path + '.index') and os.path.exists(path + '.pkl'):
+            self.index = faiss.read_index(path + '.index')
+            with open(path + '.pkl', 'rb') as f:
+                self.results = pickle.load(f)
+        else:
+            # Inner product over L2-normalized vectors is cosine similarity
+            self.index = faiss.IndexFlatIP(dimension)
+
+    def _normalize(self, embedding: List[float]):
+        vector = self._numpy.asarray([embedding], dtype='float32')
+        self._faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, embedding: List[float]) -> Optional[Dict]:
+        """Return the stored result closest to the embedding if it clears the threshold"""
+        if self.index.ntotal == 0:
+            return None
+
+        scores, ids = self.index.search(self._normalize(embedding), 1)
+        if scores[0][0] >= self.threshold:
+            return self.results[ids[0][0]]
+        return None
+
+    def add(self, embedding: List[float], result: Dict):
+        """Store a result under the embedding of its task"""
+        self.index.add(self._normalize(embedding))
+        self.results.append(result)
+
+    def save(self):
+        """Persist the index and stored results next to the configured path"""
+        if not self.path:
+            return
+        self._faiss.write_index(self.index, self.path + '.index')
+        with open(self.path + '.pkl', 'wb') as f:
+            pickle.dump(self.results, f)